@@ -1,18 +1,31 @@
+import asyncio
+import math
+import os
+import pathlib
 from typing import Any
 
 import duckdb
-from fastapi import FastAPI, Request
+import orjson
+import pyarrow as pa
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi.exceptions import RequestValidationError
 
+from app.bloom import BloomFilter
+from app.cache import ResultCache
 from app.database import setup_database
-from app.models import StringMatch, StringQuery
-from app.paths import app as app_dir, db as db_path
-from app.queries import match_passwords, match_usernames
+from app.models import StringMatch, StringQuery, StringQueryBatch
+from app.paths import app as app_dir, db as db_path, pw_bloom, user_bloom
+from app.queries import (
+    match_passwords,
+    match_passwords_many,
+    match_usernames,
+    validate_query,
+)
 
 # Initialize the database on startup if it doesn't exist
 if not db_path.exists():
@@ -21,11 +34,190 @@ if not db_path.exists():
     except Exception as e:
         print(f"Database already initialized or error: {e}")
 
+# cgroup v2 CPU quota of the container, as "<quota> <period>" or "max <period>"
+CGROUP_CPU_MAX = pathlib.Path("/sys/fs/cgroup/cpu.max")
+
+
+def _thread_count(cpu_max: pathlib.Path = CGROUP_CPU_MAX) -> int:
+    """Number of DuckDB threads: APP_THREADS if set, else the CPUs the process may use"""
+    if env := os.environ.get("APP_THREADS"):
+        return max(1, int(env))
+
+    # Respects CPU affinity, but not a container's CPU quota, which is read separately
+    n = os.process_cpu_count() or 1
+    try:
+        quota, period = cpu_max.read_text().split()
+        if quota != "max":
+            n = min(n, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return n
+
+
+# Settings for the shared connection: keep file metadata cached across queries and
+# size the worker pool and memory budget explicitly
+DB_CONFIG = {
+    "enable_object_cache": "true",
+    "threads": str(_thread_count()),
+    "memory_limit": "4GB",
+}
+
+
+def _prewarm_page_cache(path: pathlib.Path) -> None:
+    """Ask the kernel to start reading a file into the page cache ahead of first use"""
+    # posix_fadvise is unavailable on macOS and Windows; there the cache warms lazily
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        # A length of 0 covers the whole file; the readahead runs asynchronously
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+_prewarm_page_cache(db_path)
+
+# Single read-only connection shared by all handlers; each request gets its own cursor
+DB = duckdb.connect(str(db_path), read_only=True, config=DB_CONFIG)
+
+# A column of every table the app reads; databases built by an older setup_database()
+# lack some of them and must be rebuilt
+REQUIRED_COLUMNS = [
+    ("passwords", "password_lc"),
+    ("usernames", "username_lc"),
+    ("pw_stats", "count"),
+]
+
+
+def _check_schema(conn: duckdb.DuckDBPyConnection) -> None:
+    """Exit with a rebuild hint if the database predates the current schema"""
+    cur = conn.cursor()
+    try:
+        columns = cur.execute("SELECT table_name, column_name FROM information_schema.columns;")
+        present = set(columns.fetchall())
+    finally:
+        cur.close()
+
+    missing = [f"{t}.{c}" for t, c in REQUIRED_COLUMNS if (t, c) not in present]
+    if missing:
+        raise SystemExit(
+            f"Database at {db_path} is missing {', '.join(missing)}; "
+            "it was built by an older version, rebuild it with: python -m app.database"
+        )
+
+
+_check_schema(DB)
+
+
+def _run_query(sql: str, params: list[Any]) -> pa.Table:
+    """Execute a parameterized query on a fresh cursor of the shared connection"""
+    cur = DB.cursor()
+    try:
+        return cur.execute(sql, params).fetch_arrow_table()
+    finally:
+        cur.close()
+
+
+def _to_matches(tbl: pa.Table) -> list[StringMatch]:
+    """Build the match payload straight from the Arrow result columns"""
+    return [
+        {"matched_string": m, "source": s}
+        for m, s in zip(tbl.column(0).to_pylist(), tbl.column(1).to_pylist(), strict=True)
+    ]
+
+
 # Set up rate limiting
 limiter = Limiter(key_func=get_remote_address)
 
-app = FastAPI(title="Credential Checker", version="0.1.0")
+# Upper bound on DuckDB queries running at once, independent of Starlette's threadpool
+MAX_CONCURRENT_QUERIES = 8
+
+# Serialized responses of recent searches; results larger than this many rows are not cached
+CACHE_MAX_RESULTS = 1024
+
+app = FastAPI(
+    title="Credential Checker", version="0.1.0", default_response_class=ORJSONResponse
+)
 app.state.limiter = limiter
+app.state.query_sem = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+app.state.result_cache = ResultCache(maxsize=10_000)
+
+_MATCHERS = {"passwords": match_passwords, "usernames": match_usernames}
+
+# Bloom filters over the lowercased values let most exact-match misses skip DuckDB.
+# setup_database() writes them next to the database; if the files are missing,
+# every lookup simply goes to DuckDB.
+app.state.bloom_filters = {
+    table: BloomFilter.load(path)
+    for table, path in [("passwords", pw_bloom), ("usernames", user_bloom)]
+    if path.exists()
+}
+
+
+def _load_stats() -> dict[str, Any]:
+    """Read the per-source password counts precomputed by setup_database()"""
+    cur = DB.cursor()
+    try:
+        sources = cur.execute("SELECT source, count FROM pw_stats ORDER BY count DESC;").fetchall()
+    finally:
+        cur.close()
+
+    return {
+        "total_passwords": sum(s[1] for s in sources),
+        "sources": [{"name": s[0], "count": s[1]} for s in sources],
+    }
+
+
+# The database is read-only, so the stats are computed once at startup
+app.state.stats = _load_stats()
+
+
+async def _query(sql: str, params: list[Any]) -> pa.Table:
+    """Run a query in a worker thread, capped by the query semaphore"""
+    async with app.state.query_sem:
+        return await asyncio.to_thread(_run_query, sql, params)
+
+
+def _definitely_absent(table: str, value: str) -> bool:
+    """Whether the table's Bloom filter proves an exact match for a value has no results"""
+    bloom = app.state.bloom_filters.get(table)
+    # Non-ASCII input is skipped: Python's and DuckDB's lower() may disagree on it
+    if bloom is None or not value.isascii():
+        return False
+    return value.lower() not in bloom
+
+
+async def _search(table: str, query: StringQuery) -> Response:
+    """Answer a search from the result cache or Bloom filter, querying DuckDB otherwise"""
+    error = validate_query(query.query_string, query.include_substring_matches)
+    if error is not None:
+        raise HTTPException(status_code=400, detail=error)
+
+    # Only ASCII needles are lowercased for the cache key: on other text Python's
+    # lower() may merge values that DuckDB's lower() keeps apart
+    needle = query.query_string
+    if query.ignore_case and needle.isascii():
+        needle = needle.lower()
+    key = (table, needle, query.ignore_case, query.include_substring_matches)
+    cache = app.state.result_cache
+
+    body = cache.get(key)
+    exact = not query.include_substring_matches
+    if body is None and exact and _definitely_absent(table, query.query_string):
+        body = b"[]"
+    elif body is None:
+        sql, params = _MATCHERS[table](
+            input=query.query_string,
+            ignore_case=query.ignore_case,
+            include_substring_matches=query.include_substring_matches,
+        )
+        results = await _query(sql, params)
+        body = orjson.dumps(_to_matches(results))
+        if results.num_rows <= CACHE_MAX_RESULTS:
+            cache.put(key, body)
+    return Response(content=body, media_type="application/json")
+
 
 # Mount static files
 static_dir = app_dir / "static"
@@ -47,39 +239,21 @@ def health_check():
 
 @app.post("/search/password", response_model=list[StringMatch])
 @limiter.limit("30/minute")
-def search_password(request: Request, query: StringQuery) -> list[StringMatch]:
+async def search_password(request: Request, query: StringQuery) -> Response:
     """Search for passwords in the database (limit: 30 requests/minute)"""
-    with duckdb.connect(db_path, read_only=True) as conn:
-        sql = match_passwords(
-            input=query.query_string,
-            ignore_case=query.ignore_case,
-            include_substring_matches=query.include_substring_matches,
-        )
-        results = conn.execute(sql).fetchall()
-
-        matches = [StringMatch(matched_string=row[0], source=row[1]) for row in results]
-        return matches
+    return await _search("passwords", query)
 
 
 @app.post("/search/username", response_model=list[StringMatch])
 @limiter.limit("30/minute")
-def search_username(request: Request, query: StringQuery) -> list[StringMatch]:
+async def search_username(request: Request, query: StringQuery) -> Response:
     """Search for usernames in the database (limit: 30 requests/minute)"""
-    with duckdb.connect(db_path, read_only=True) as conn:
-        sql = match_usernames(
-            input=query.query_string,
-            ignore_case=query.ignore_case,
-            include_substring_matches=query.include_substring_matches,
-        )
-        results = conn.execute(sql).fetchall()
-
-        matches = [StringMatch(matched_string=row[0], source=row[1]) for row in results]
-        return matches
+    return await _search("usernames", query)
 
 
 @app.post("/password", response_model=list[StringMatch])
 @limiter.limit("30/minute")
-def check_password(request: Request, query: StringQuery) -> list[StringMatch]:
+async def check_password(request: Request, query: StringQuery) -> Response:
     """
     Check if a password exists in the breach database (limit: 30 requests/minute).
 
@@ -90,21 +264,12 @@ def check_password(request: Request, query: StringQuery) -> list[StringMatch]:
 
     Returns a list of matches with their sources.
     """
-    with duckdb.connect(db_path, read_only=True) as conn:
-        sql = match_passwords(
-            input=query.query_string,
-            ignore_case=query.ignore_case,
-            include_substring_matches=query.include_substring_matches,
-        )
-        results = conn.execute(sql).fetchall()
-
-        matches = [StringMatch(matched_string=row[0], source=row[1]) for row in results]
-        return matches
+    return await _search("passwords", query)
 
 
 @app.post("/username", response_model=list[StringMatch])
 @limiter.limit("30/minute")
-def check_username(request: Request, query: StringQuery) -> list[StringMatch]:
+async def check_username(request: Request, query: StringQuery) -> Response:
     """
     Check if a username exists in the breach database (limit: 30 requests/minute).
 
@@ -115,35 +280,39 @@ def check_username(request: Request, query: StringQuery) -> list[StringMatch]:
 
     Returns a list of matches with their sources.
     """
-    with duckdb.connect(db_path, read_only=True) as conn:
-        sql = match_usernames(
-            input=query.query_string,
-            ignore_case=query.ignore_case,
-            include_substring_matches=query.include_substring_matches,
-        )
-        results = conn.execute(sql).fetchall()
+    return await _search("usernames", query)
 
-        matches = [StringMatch(matched_string=row[0], source=row[1]) for row in results]
-        return matches
+
+@app.post("/passwords:batch", response_model=dict[str, list[StringMatch]])
+@limiter.limit("30/minute")
+async def check_passwords_batch(request: Request, query: StringQueryBatch) -> ORJSONResponse:
+    """
+    Check up to MAX_BATCH_SIZE (1000) passwords against the breach database in one
+    exact-match query (limit: 30 requests/minute).
+
+    Parameters:
+    - query_strings: The passwords to search for
+    - ignore_case: If True, search case-insensitively (default: True)
+
+    Returns the list of matches for each password, keyed by the password as sent.
+    """
+    candidates = [s for s in query.query_strings if not _definitely_absent("passwords", s)]
+    matches: dict[str, list[StringMatch]] = {}
+    if candidates:
+        sql, params = match_passwords_many(candidates, ignore_case=query.ignore_case)
+        results = await _query(sql, params)
+        for needle, matched, source in zip(
+            *(results.column(i).to_pylist() for i in range(3)), strict=True
+        ):
+            matches.setdefault(needle, []).append({"matched_string": matched, "source": source})
+
+    return ORJSONResponse({s: matches.get(s, []) for s in query.query_strings})
 
 
 @app.get("/stats")
 def get_stats() -> dict[str, Any]:
     """Get statistics about the password database"""
-    conn = duckdb.connect(db_path, read_only=True)
-    try:
-        _total = conn.execute("SELECT COUNT(*) FROM passwords;").fetchone()
-        total = _total if _total is not None else 0
-        sources = conn.execute(
-            "SELECT source, COUNT(*) as count FROM passwords GROUP BY source ORDER BY count DESC;"
-        ).fetchall()
-
-        return {
-            "total_passwords": total,
-            "sources": [{"name": s[0], "count": s[1]} for s in sources],
-        }
-    finally:
-        conn.close()
+    return app.state.stats
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+import hashlib
+import math
+import pathlib
+import struct
+
+import duckdb
+
+# File header: number of bits, number of hash functions
+_HEADER = struct.Struct("<QI")
+
+
+def bloom_size(n_items: int, error_rate: float) -> tuple[int, int]:
+    """Return the optimal (number of bits, number of hashes) for a Bloom filter"""
+    n_items = max(n_items, 1)
+    n_bits = math.ceil(-n_items * math.log(error_rate) / math.log(2) ** 2)
+    n_hashes = max(1, round(n_bits / n_items * math.log(2)))
+    return n_bits, n_hashes
+
+
+class BloomFilter:
+    """
+    Read-only Bloom filter over lowercased values.
+
+    Bit positions use double hashing on the two halves of the value's MD5 digest,
+    `(h1 + i * h2) % n_bits` with both halves reduced modulo `n_bits` first, so they
+    can be computed identically in DuckDB SQL (see `build_sql`) and in Python.
+    """
+
+    def __init__(self, bits: bytes, n_bits: int, n_hashes: int):
+        self.bits = bits
+        self.n_bits = n_bits
+        self.n_hashes = n_hashes
+
+    def __contains__(self, value: str) -> bool:
+        digest = hashlib.md5(value.encode()).hexdigest()
+        h1 = int(digest[:16], 16) % self.n_bits
+        h2 = int(digest[16:], 16) % self.n_bits
+        for i in range(self.n_hashes):
+            pos = (h1 + i * h2) % self.n_bits
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @staticmethod
+    def build_sql(table: str, column: str, n_bits: int, n_hashes: int) -> str:
+        """SQL returning one UTINYINT per filter byte, in order, for `column` of `table`"""
+        return f"""
+        WITH hashes AS (
+          SELECT DISTINCT
+            (('0x' || substr(d, 1, 16))::UBIGINT % {n_bits})::BIGINT AS h1,
+            (('0x' || substr(d, 17, 16))::UBIGINT % {n_bits})::BIGINT AS h2
+          FROM (SELECT md5({column}) AS d FROM {table})
+        ), positions AS (
+          SELECT unnest([(h1 + i * h2) % {n_bits} for i in range({n_hashes})]) AS pos
+          FROM hashes
+        ), filled AS (
+          SELECT pos // 8 AS b, bit_or((1 << (pos % 8)::INTEGER)::UTINYINT) AS v
+          FROM positions
+          GROUP BY b
+        )
+        SELECT coalesce(v, 0)::UTINYINT AS v
+        FROM range({(n_bits + 7) // 8}) r(b)
+        LEFT JOIN filled USING (b)
+        ORDER BY b
+        """
+
+    @classmethod
+    def build(
+        cls,
+        conn: duckdb.DuckDBPyConnection,
+        table: str,
+        column: str,
+        error_rate: float = 1e-4,
+    ) -> "BloomFilter":
+        """Build a filter over the distinct values of an already-lowercased column"""
+        row = conn.execute(f"SELECT count(DISTINCT {column}) FROM {table}").fetchone()
+        n_items = row[0] if row is not None else 0
+        n_bits, n_hashes = bloom_size(n_items, error_rate)
+        tbl = conn.execute(cls.build_sql(table, column, n_bits, n_hashes)).fetch_arrow_table()
+        arr = tbl.column(0).combine_chunks()
+        bits = arr.buffers()[1].to_pybytes()[arr.offset : arr.offset + len(arr)]
+        return cls(bits, n_bits, n_hashes)
+
+    def save(self, path: pathlib.Path) -> None:
+        path.write_bytes(_HEADER.pack(self.n_bits, self.n_hashes) + self.bits)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "BloomFilter":
+        data = path.read_bytes()
+        n_bits, n_hashes = _HEADER.unpack_from(data)
+        return cls(data[_HEADER.size :], n_bits, n_hashes)
@@ -0,0 +1,27 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+class ResultCache:
+    """Bounded LRU cache for serialized search responses"""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> bytes | None:
+        """Return the cached body for a key and mark it as recently used"""
+        body = self._data.get(key)
+        if body is not None:
+            self._data.move_to_end(key)
+        return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        """Store a body, evicting the least recently used entry when full"""
+        self._data[key] = body
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 
+import pathlib
+
 import duckdb as ddb
 
 from app import paths
+from app.bloom import BloomFilter
+
+
+def setup_bloom_filter(
+    conn: ddb.DuckDBPyConnection, table: str, column: str, path: pathlib.Path
+):
+    """Build a Bloom filter over the lowercased column of a table and save it to disk"""
+    BloomFilter.build(conn, table, f"{column}_lc").save(path)
 
 
 def setup_pw_table():
@@ -10,21 +20,35 @@ def setup_pw_table():
     create_cmd = """
     CREATE OR REPLACE TABLE passwords (
       password VARCHAR,
-      source VARCHAR,
-      UNIQUE(password, source)
+      password_lc VARCHAR,
+      source VARCHAR
     )
     """
 
     conn = ddb.connect(paths.db)
     conn.execute(create_cmd)
 
-    for pwpath in paths.pw.glob("*.parquet"):
-        insert_cmd = f"""
-        INSERT INTO passwords
-        SELECT password, '{pwpath.stem}' as source
-        FROM '{pwpath}'
-        """
-        conn.execute(insert_cmd)
+    # Load and deduplicate all files in a single parallel scan. Rows are stored sorted
+    # by the lowercased value so per-row-group min/max zone maps prune lookups.
+    insert_cmd = f"""
+    INSERT INTO passwords
+    SELECT password, lower(password) AS password_lc, regexp_extract(filename, '([^/\\\\]+)\\.parquet$', 1) AS source
+    FROM read_parquet('{paths.pw / "*.parquet"}', filename = true)
+    GROUP BY ALL
+    ORDER BY password_lc
+    """
+    conn.execute(insert_cmd)
+
+    # Index both the raw and the lowercased column for exact-match lookups
+    conn.execute("CREATE INDEX idx_passwords ON passwords(password);")
+    conn.execute("CREATE INDEX idx_passwords_lc ON passwords(password_lc);")
+    setup_bloom_filter(conn, "passwords", "password", paths.pw_bloom)
+
+    # The table never changes after setup, so /stats is served from a precomputed summary
+    conn.execute(
+        "CREATE OR REPLACE TABLE pw_stats AS "
+        "SELECT source, COUNT(*) AS count FROM passwords GROUP BY source;"
+    )
 
     n_rows = conn.execute("SELECT count(*) FROM passwords;").fetchall()[0][0]
     print(f"Number of Rows in password table: {n_rows:_}")
@@ -37,21 +61,29 @@ def setup_usernames_table():
     create_cmd = """
     CREATE OR REPLACE TABLE usernames (
       username VARCHAR,
-      source VARCHAR,
-      UNIQUE(username, source)
+      username_lc VARCHAR,
+      source VARCHAR
     )
     """
 
     conn = ddb.connect(paths.db)
     conn.execute(create_cmd)
 
-    for upath in paths.user.glob("*.parquet"):
-        insert_cmd = f"""
-        INSERT INTO usernames
-        SELECT username, '{upath.stem}' as source
-        FROM '{upath}'
-        """
-        conn.execute(insert_cmd)
+    # Load and deduplicate all files in a single parallel scan. Rows are stored sorted
+    # by the lowercased value so per-row-group min/max zone maps prune lookups.
+    insert_cmd = f"""
+    INSERT INTO usernames
+    SELECT username, lower(username) AS username_lc, regexp_extract(filename, '([^/\\\\]+)\\.parquet$', 1) AS source
+    FROM read_parquet('{paths.user / "*.parquet"}', filename = true)
+    GROUP BY ALL
+    ORDER BY username_lc
+    """
+    conn.execute(insert_cmd)
+
+    # Index both the raw and the lowercased column for exact-match lookups
+    conn.execute("CREATE INDEX idx_usernames ON usernames(username);")
+    conn.execute("CREATE INDEX idx_usernames_lc ON usernames(username_lc);")
+    setup_bloom_filter(conn, "usernames", "username", paths.user_bloom)
 
     n_rows = conn.execute("SELECT count(*) FROM usernames;").fetchall()[0][0]
     print(f"Number of Rows in usernames table: {n_rows:_}")
@@ -1,12 +1,30 @@
+from typing import Annotated, TypedDict
+
 from pydantic import BaseModel, Field
 
+# Length limits for a single query string
+MAX_QUERY_LENGTH = 1000
+# Shorter substring needles would match most of the table
+MIN_SUBSTRING_LENGTH = 3
+# Most query strings accepted by one batch request
+MAX_BATCH_SIZE = 1000
+
 
 class StringQuery(BaseModel):
-    query_string: str = Field(..., min_length=1, max_length=1000)
+    query_string: str = Field(..., min_length=1, max_length=MAX_QUERY_LENGTH)
     ignore_case: bool = True
     include_substring_matches: bool = False
 
 
-class StringMatch(BaseModel):
+class StringQueryBatch(BaseModel):
+    query_strings: list[Annotated[str, Field(min_length=1, max_length=MAX_QUERY_LENGTH)]] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE
+    )
+    ignore_case: bool = True
+
+
+# Plain dict rather than a model: matches are built straight from DuckDB results
+# and need no validation, the type only documents the response schema
+class StringMatch(TypedDict):
     matched_string: str
     source: str
@@ -3,7 +3,7 @@ import pathlib
 # In[37]:
 
 
-project = pathlib.Path().cwd()
+project = pathlib.Path(__file__).resolve().parent.parent
 app = project / "app"
 data = project / "data"
 pw = data / "passwords"
@@ -11,3 +11,5 @@ user = data / "usernames"
 database_dir = project / "database"
 database_dir.mkdir(exist_ok=True)
 db = database_dir / "creads.db"
+pw_bloom = database_dir / "passwords.bloom"
+user_bloom = database_dir / "usernames.bloom"
@@ -1,51 +1,89 @@
+import pathlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import duckdb
+
+from app import paths
+from app.models import MAX_QUERY_LENGTH, MIN_SUBSTRING_LENGTH
+
+# Searchable tables and the column each one matches against; every table also
+# has a pre-lowercased `<column>_lc` copy
+_COLUMNS = {"passwords": "password", "usernames": "username"}
+
+# WHERE clauses keyed on include_substring_matches. Search values are always bound
+# as parameters, never interpolated, and case-insensitive searches lowercase them
+# with DuckDB's lower(), the same function that filled `<column>_lc`. Substring
+# matches use contains() rather than LIKE, so `%` and `_` in a needle are literal.
+_CONDITIONS = {
+    False: "{target} = {needle}",
+    True: "contains({target}, {needle})",
+}
+
+# Every query `match_field` can produce, keyed on
+# (table, ignore_case, include_substring_matches) and built once at import time
+_TEMPLATES = {
+    (table, ignore_case, substring): f"""
+    SELECT {column}, source
+    FROM {table}
+    WHERE {_CONDITIONS[substring].format(
+        target=f"{column}_lc" if ignore_case else column,
+        needle="lower($1)" if ignore_case else "$1",
+    )};
+    """
+    for table, column in _COLUMNS.items()
+    for ignore_case in (False, True)
+    for substring in (False, True)
+}
+
+
+def validate_query(input: str, include_substring_matches: bool = False) -> str | None:
+    """
+    Check a query string against the API's length limits without raising.
+
+    Args:
+        input (str): The value to search for.
+        include_substring_matches (bool): Whether it is a substring search.
+    Returns:
+        str | None: Why the query would be rejected, or None if it is valid.
+    """
+    if not input:
+        return "Query strings must not be empty"
+    if len(input) > MAX_QUERY_LENGTH:
+        return f"Query strings may be at most {MAX_QUERY_LENGTH} characters"
+    if include_substring_matches and len(input) < MIN_SUBSTRING_LENGTH:
+        return f"Substring queries require at least {MIN_SUBSTRING_LENGTH} characters"
+    return None
+
+
 def match_field(
     table: str,
-    column: str,
     input: str,
     ignore_case: bool = True,
     include_substring_matches: bool = False,
-) -> str:
+) -> tuple[str, list[str]]:
     """
-    Generate a generic SQL query to match a field in a table.
+    Look up the precompiled parameterized SQL query to match a field in a table.
+
+    Case-insensitive queries compare against the pre-lowercased `<column>_lc`, so
+    LOWER() only runs once, on the bound `input`. Python's str.lower() disagrees with
+    DuckDB's on some non-ASCII text, so `input` is passed as entered.
 
     Args:
-        table (str): The table name to query from.
-        column (str): The column name to match against.
+        table (str): The table name to query from, a key of `_COLUMNS`.
         input (str): The value to search for.
         ignore_case (bool): Whether to ignore case in matching.
         include_substring_matches (bool): Whether to include substring matches.
     Returns:
-        str: SQL query string.
-    """
-    # Escape single quotes in input to prevent SQL injection
-    escaped_input = input.replace("'", "''")
-    
-    if ignore_case:
-        input_expr = f"LOWER('{escaped_input}')"
-        column_expr = f"LOWER({column})"
-    else:
-        input_expr = f"'{escaped_input}'"
-        column_expr = column
-
-    # Exact match condition
-    where_clause = (
-        f"{column_expr} = {input_expr}"
-        if not include_substring_matches
-        else f"{column_expr} LIKE '%' || {input_expr} || '%'"
-    )
-
-    sql_query = f"""
-    SELECT {column}, source
-    FROM {table}
-    WHERE {where_clause};
+        tuple[str, list[str]]: SQL query string and its parameters.
     """
-    return sql_query
+    return _TEMPLATES[(table, ignore_case, include_substring_matches)], [input]
 
 
 # Create specialized functions using wrapper functions
 def match_passwords(
     input: str, ignore_case: bool = True, include_substring_matches: bool = False
-) -> str:
+) -> tuple[str, list[str]]:
     """
     Generate SQL query to match passwords in the database.
 
@@ -54,11 +92,10 @@ def match_passwords(
         ignore_case (bool): Whether to ignore case in matching.
         include_substring_matches (bool): Whether to include substring matches.
     Returns:
-        str: SQL query string.
+        tuple[str, list[str]]: SQL query string and its parameters.
     """
     return match_field(
         table="passwords",
-        column="password",
         input=input,
         ignore_case=ignore_case,
         include_substring_matches=include_substring_matches,
@@ -67,7 +104,7 @@ def match_passwords(
 
 def match_usernames(
     input: str, ignore_case: bool = True, include_substring_matches: bool = False
-) -> str:
+) -> tuple[str, list[str]]:
     """
     Generate SQL query to match usernames in the database.
 
@@ -76,110 +113,267 @@ def match_usernames(
         ignore_case (bool): Whether to ignore case in matching.
         include_substring_matches (bool): Whether to include substring matches.
     Returns:
-        str: SQL query string.
+        tuple[str, list[str]]: SQL query string and its parameters.
     """
     return match_field(
         table="usernames",
-        column="username",
         input=input,
         ignore_case=ignore_case,
         include_substring_matches=include_substring_matches,
     )
 
 
+def match_field_many(
+    table: str,
+    inputs: list[str],
+    ignore_case: bool = True,
+) -> tuple[str, list[str]]:
+    """
+    Generate one parameterized SQL query matching many exact values at once.
+
+    Each result row starts with the input it matched, exactly as passed, so rows can
+    be grouped back to their input without lowercasing them again in Python.
+
+    Args:
+        table (str): The table name to query from, a key of `_COLUMNS`.
+        inputs (list[str]): The distinct values to search for.
+        ignore_case (bool): Whether to ignore case in matching.
+    Returns:
+        tuple[str, list[str]]: SQL query string with `$n` placeholders and its parameters.
+    """
+    column = _COLUMNS[table]
+    target = f"{column}_lc" if ignore_case else column
+    needle = "lower({})" if ignore_case else "{}"
+    placeholders = [f"${i}" for i in range(1, len(inputs) + 1)]
+    # The IN list lets the index and zone maps select the few matching rows; the
+    # join back to the inputs then tags each row with the input it matched
+    sql_query = f"""
+    SELECT q.needle, t.{column}, t.source
+    FROM (VALUES {", ".join(f"({p})" for p in placeholders)}) q(needle)
+    JOIN (
+      SELECT *
+      FROM {table}
+      WHERE {target} IN ({", ".join(needle.format(p) for p in placeholders)})
+    ) t ON t.{target} = {needle.format("q.needle")};
+    """
+    return sql_query, inputs
+
+
+def match_passwords_many(
+    inputs: list[str], ignore_case: bool = True
+) -> tuple[str, list[str]]:
+    """
+    Generate SQL query to match many passwords in the database at once.
+
+    Args:
+        inputs (list[str]): The passwords to check.
+        ignore_case (bool): Whether to ignore case in matching.
+    Returns:
+        tuple[str, list[str]]: SQL query string and its parameters.
+    """
+    return match_field_many(
+        table="passwords",
+        inputs=list(dict.fromkeys(inputs)),
+        ignore_case=ignore_case,
+    )
+
+
+@contextmanager
+def read_only_connection(
+    path: pathlib.Path = paths.db,
+) -> Iterator[duckdb.DuckDBPyConnection]:
+    """
+    Open one read-only connection to the database for a batch of queries.
+
+    Callers run every query of the batch on it (or on cursors of it for concurrent
+    use) instead of connecting per query; it is closed when the block exits.
+
+    Args:
+        path (pathlib.Path): The database file to open.
+    Yields:
+        duckdb.DuckDBPyConnection: The open connection.
+    """
+    conn = duckdb.connect(str(path), read_only=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _sample_db() -> duckdb.DuckDBPyConnection:
+    """Create a small in-memory database for executing the generated queries"""
+    conn = duckdb.connect()
+    conn.execute(
+        "CREATE TABLE passwords AS SELECT password, lower(password) AS password_lc, source "
+        "FROM (VALUES ('password123', 'a'), ('Password123', 'b'), ('admin', 'a'), "
+        "('superadmin', 'b'), "
+        "('ΟΔΟΣ', 'c'), ('İSTANBUL1', 'c')) t(password, source)"
+    )
+    conn.execute(
+        "CREATE TABLE usernames AS SELECT username, lower(username) AS username_lc, source "
+        "FROM (VALUES ('john_doe', 'a'), ('John_Doe', 'b')) t(username, source)"
+    )
+    return conn
+
+
 def test_match_field() -> None:
+    conn = _sample_db()
+
     # Test exact match with ignore case
-    sql = match_field(
+    sql, params = match_field(
         table="passwords",
-        column="password",
         input="password123",
         ignore_case=True,
         include_substring_matches=False,
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE LOWER(password) = LOWER('password123');
-    """
-    assert sql.strip() == expected_sql.strip()
+    assert params == ["password123"]
+    rows = conn.execute(sql, params).fetchall()
+    assert sorted(rows) == [("Password123", "b"), ("password123", "a")]
 
     # Test substring match without ignore case
-    sql = match_field(
+    sql, params = match_field(
         table="passwords",
-        column="password",
         input="admin",
         ignore_case=False,
         include_substring_matches=True,
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE password LIKE '%' || 'admin' || '%';
-    """
-    assert sql.strip() == expected_sql.strip()
+    rows = conn.execute(sql, params).fetchall()
+    assert sorted(rows) == [("admin", "a"), ("superadmin", "b")]
 
     # Test substring match with ignore case
-    sql = match_field(
+    sql, params = match_field(
         table="passwords",
-        column="password",
-        input="TestPass",
+        input="password",
         ignore_case=True,
         include_substring_matches=True,
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE LOWER(password) LIKE '%' || LOWER('TestPass') || '%';
-    """
-    assert sql.strip() == expected_sql.strip()
+    rows = conn.execute(sql, params).fetchall()
+    assert len(rows) == 2
 
     # Test exact match without ignore case
-    sql = match_field(
+    sql, params = match_field(
         table="passwords",
-        column="password",
-        input="ExactMatch!",
+        input="Password123",
         ignore_case=False,
         include_substring_matches=False,
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE password = 'ExactMatch!';
-    """
-    assert sql.strip() == expected_sql.strip()
+    rows = conn.execute(sql, params).fetchall()
+    assert rows == [("Password123", "b")]
+
+    # Test substring match of two characters
+    sql, params = match_field(
+        table="passwords",
+        input="ad",
+        ignore_case=True,
+        include_substring_matches=True,
+    )
+    assert params == ["ad"]
+    rows = conn.execute(sql, params).fetchall()
+    assert sorted(rows) == [("admin", "a"), ("superadmin", "b")]
+
+    # Non-ASCII needles are lowercased by DuckDB, like the stored `_lc` column;
+    # Python's str.lower() would turn these into values that are not stored
+    for value in ["ΟΔΟΣ", "İSTANBUL1"]:
+        sql, params = match_field(table="passwords", input=value, ignore_case=True)
+        assert params == [value]
+        assert conn.execute(sql, params).fetchall() == [(value, "c")]
+
+    # LIKE wildcards in the needle are matched literally
+    sql, params = match_field(
+        table="passwords",
+        input="pass%",
+        ignore_case=True,
+        include_substring_matches=True,
+    )
+    assert conn.execute(sql, params).fetchall() == []
+
+
+def test_match_field_templates() -> None:
+    # Every (table, ignore_case, include_substring_matches) combination is precompiled
+    assert len(_TEMPLATES) == 8
+    sql_a, _ = match_field(table="usernames", input="a", include_substring_matches=True)
+    sql_b, _ = match_field(table="usernames", input="b", include_substring_matches=True)
+    assert sql_a is sql_b
+
+
+def test_validate_query() -> None:
+    assert validate_query("abc") is None
+    assert validate_query("ab", include_substring_matches=True) is not None
+    assert validate_query("ab") is None
+    assert validate_query("") is not None
+    assert validate_query("a" * MAX_QUERY_LENGTH) is None
+    assert validate_query("a" * (MAX_QUERY_LENGTH + 1)) is not None
+
+
+def test_match_field_injection() -> None:
+    conn = _sample_db()
+
+    # Quotes in the input are bound as data, never parsed as SQL
+    for payload in ["' OR '1'='1", "admin'--", "'; DROP TABLE passwords; --"]:
+        sql, params = match_field(table="passwords", input=payload)
+        assert payload not in sql
+        assert conn.execute(sql, params).fetchall() == []
+
+    assert conn.execute("SELECT count(*) FROM passwords").fetchone() == (6,)
 
 
 def test_match_passwords() -> None:
-    # Test using the partial function
-    sql = match_passwords(
-        input="password123", ignore_case=True, include_substring_matches=False
+    conn = _sample_db()
+
+    sql, params = match_passwords(
+        input="PASSWORD123", ignore_case=True, include_substring_matches=False
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE LOWER(password) = LOWER('password123');
-    """
-    assert sql.strip() == expected_sql.strip()
+    assert params == ["PASSWORD123"]
+    assert len(conn.execute(sql, params).fetchall()) == 2
 
-    sql = match_passwords(
+    sql, params = match_passwords(
         input="admin", ignore_case=False, include_substring_matches=True
     )
-    expected_sql = """
-    SELECT password, source
-    FROM passwords
-    WHERE password LIKE '%' || 'admin' || '%';
-    """
-    assert sql.strip() == expected_sql.strip()
+    assert len(conn.execute(sql, params).fetchall()) == 2
 
 
 def test_match_usernames() -> None:
-    # Test using the username partial function
-    sql = match_usernames(
+    conn = _sample_db()
+
+    sql, params = match_usernames(
         input="john_doe", ignore_case=True, include_substring_matches=False
     )
-    expected_sql = """
-    SELECT username, source
-    FROM usernames
-    WHERE LOWER(username) = LOWER('john_doe');
-    """
-    assert sql.strip() == expected_sql.strip()
+    rows = conn.execute(sql, params).fetchall()
+    assert sorted(rows) == [("John_Doe", "b"), ("john_doe", "a")]
+
+
+def test_read_only_connection(tmp_path: pathlib.Path) -> None:
+    import pytest
+
+    path = tmp_path / "sample.db"
+    duckdb.connect(str(path)).execute("CREATE TABLE t AS SELECT 1 AS x").close()
+
+    with read_only_connection(path) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+        with pytest.raises(duckdb.Error):
+            conn.execute("INSERT INTO t VALUES (2)")
+
+    # The connection is closed once the block exits
+    with pytest.raises(duckdb.Error):
+        conn.execute("SELECT 1")
+
+
+def test_match_passwords_many() -> None:
+    conn = _sample_db()
+
+    sql, params = match_passwords_many(
+        ["PASSWORD123", "password123", "PASSWORD123", "ΟΔΟΣ", "nope"]
+    )
+    assert params == ["PASSWORD123", "password123", "ΟΔΟΣ", "nope"]
+    rows = conn.execute(sql, params).fetchall()
+    assert sorted(rows) == [
+        ("PASSWORD123", "Password123", "b"),
+        ("PASSWORD123", "password123", "a"),
+        ("password123", "Password123", "b"),
+        ("password123", "password123", "a"),
+        ("ΟΔΟΣ", "ΟΔΟΣ", "c"),
+    ]
+
+    sql, params = match_passwords_many(["Password123", "ADMIN"], ignore_case=False)
+    rows = conn.execute(sql, params).fetchall()
+    assert rows == [("Password123", "Password123", "b")]
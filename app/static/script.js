@@ -18,6 +18,10 @@ async function search() {
         showError('Please enter a search query');
         return;
     }
+    if (substring.checked && query.length < 3) {
+        showError('Substring searches need at least 3 characters');
+        return;
+    }
 
     loading.style.display = 'block';
     error.style.display = 'none';
@@ -1,7 +1,14 @@
+import os
+import re
+from operator import itemgetter
+
+import duckdb
 import pytest
 from fastapi.testclient import TestClient
 
-from app.app import app
+from app.app import _check_schema, _thread_count, app
+from app.bloom import BloomFilter
+from app.cache import ResultCache
 
 # Create a test client
 client = TestClient(app)
@@ -101,6 +108,18 @@ class TestPasswordEndpoint:
         assert isinstance(results, list)
         assert len(results) == 0
 
+    def test_password_short_substring_rejected(self):
+        """Test that substring queries shorter than three characters are rejected"""
+        response = client.post(
+            "/password",
+            json={
+                "query_string": "ab",
+                "ignore_case": True,
+                "include_substring_matches": True,
+            },
+        )
+        assert response.status_code == 400
+
 
 class TestUsernameEndpoint:
     def test_username_partial_match(self):
@@ -152,6 +171,36 @@ class TestUsernameEndpoint:
             assert all(match["matched_string"].lower() == "aaron" for match in results)
 
 
+class TestPasswordBatchEndpoint:
+    def test_batch_matches_single_lookups(self):
+        """Test that a batch returns the same matches as individual lookups, per input"""
+        inputs = ["Dragon", "dragon", "zq9-not-a-leaked-password-9qz"]
+        response = client.post(
+            "/passwords:batch", json={"query_strings": inputs, "ignore_case": True}
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert list(results) == inputs
+        assert results["zq9-not-a-leaked-password-9qz"] == []
+
+        single = client.post(
+            "/password",
+            json={
+                "query_string": "Dragon",
+                "ignore_case": True,
+                "include_substring_matches": False,
+            },
+        ).json()
+        key = itemgetter("matched_string", "source")
+        assert sorted(results["Dragon"], key=key) == sorted(single, key=key)
+        assert results["dragon"] == results["Dragon"]
+
+    def test_batch_rejects_empty_list(self):
+        """Test that an empty batch is a validation error"""
+        response = client.post("/passwords:batch", json={"query_strings": []})
+        assert response.status_code == 422
+
+
 class TestStatsEndpoint:
     def test_get_stats(self):
         """Test the stats endpoint"""
@@ -195,6 +244,109 @@ class TestResponseModel:
             assert isinstance(result["source"], str)
 
 
+class TestResultCache:
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResultCache(maxsize=2)
+        cache.put("a", b"[]")
+        cache.put("b", b"[]")
+        assert cache.get("a") == b"[]"
+        cache.put("c", b"[]")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"[]"
+        assert len(cache) == 2
+
+    def test_repeated_query_is_cached(self):
+        """Test that a repeated search is answered from the cache"""
+        query = {
+            "query_string": "Dragon",
+            "ignore_case": True,
+            "include_substring_matches": False,
+        }
+        first = client.post("/password", json=query)
+        assert app.state.result_cache.get(("passwords", "dragon", True, False)) is not None
+        second = client.post("/password", json={**query, "query_string": "DRAGON"})
+        assert second.status_code == 200
+        assert second.json() == first.json()
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self, tmp_path):
+        """Test that a filter built in DuckDB contains every value and survives a round trip"""
+        conn = duckdb.connect()
+        conn.execute(
+            "CREATE TABLE t AS SELECT 'value' || i::VARCHAR AS v_lc FROM range(5000) r(i)"
+        )
+        bloom = BloomFilter.build(conn, "t", "v_lc", error_rate=1e-3)
+        assert all(f"value{i}" in bloom for i in range(5000))
+
+        bloom.save(tmp_path / "t.bloom")
+        loaded = BloomFilter.load(tmp_path / "t.bloom")
+        assert loaded.bits == bloom.bits
+        assert all(f"value{i}" in loaded for i in range(5000))
+        # With a 0.1% error rate almost all absent values are rejected
+        assert sum(f"absent{i}" in loaded for i in range(5000)) < 50
+
+    def test_absent_password_skips_duckdb(self, monkeypatch):
+        """Test that the Bloom filter answers an exact-match miss without querying DuckDB"""
+        assert "passwords" in app.state.bloom_filters
+
+        def fail(*args):
+            raise AssertionError("DuckDB was queried for a value the filter rejects")
+
+        monkeypatch.setattr("app.app._run_query", fail)
+        response = client.post(
+            "/password",
+            json={
+                "query_string": "zq9-bloom-rejected-miss-9qz",
+                "ignore_case": True,
+                "include_substring_matches": False,
+            },
+        )
+        assert response.status_code == 200
+        assert response.json() == []
+
+
+class TestThreadCount:
+    def test_cgroup_quota_caps_threads(self, tmp_path, monkeypatch):
+        """Test that a fractional CPU quota still yields one thread"""
+        monkeypatch.delenv("APP_THREADS", raising=False)
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("50000 100000\n")
+        assert _thread_count(cpu_max) == 1
+
+    def test_unlimited_quota_uses_available_cpus(self, tmp_path, monkeypatch):
+        """Test that without a quota every available CPU is used"""
+        monkeypatch.delenv("APP_THREADS", raising=False)
+        cpu_max = tmp_path / "cpu.max"
+        cpu_max.write_text("max 100000\n")
+        assert _thread_count(cpu_max) == os.process_cpu_count()
+        assert _thread_count(tmp_path / "missing") == os.process_cpu_count()
+
+    def test_env_override(self, tmp_path, monkeypatch):
+        """Test that APP_THREADS takes precedence over the cgroup quota"""
+        monkeypatch.setenv("APP_THREADS", "3")
+        assert _thread_count(tmp_path / "missing") == 3
+
+
+class TestSchemaCheck:
+    def test_current_schema_passes(self):
+        """Test that a database with every required column passes the check"""
+        conn = duckdb.connect()
+        conn.execute("CREATE TABLE passwords (password VARCHAR, password_lc VARCHAR, source TEXT)")
+        conn.execute("CREATE TABLE usernames (username VARCHAR, username_lc VARCHAR, source TEXT)")
+        conn.execute("CREATE TABLE pw_stats (source VARCHAR, count BIGINT)")
+        _check_schema(conn)
+
+    def test_old_schema_exits_with_rebuild_hint(self):
+        """Test that a database built before pw_stats and the _lc columns is rejected"""
+        conn = duckdb.connect()
+        conn.execute("CREATE TABLE passwords (password VARCHAR, source VARCHAR)")
+        conn.execute("CREATE TABLE usernames (username VARCHAR, source VARCHAR)")
+        with pytest.raises(SystemExit, match=re.escape("python -m app.database")):
+            _check_schema(conn)
+
+
 # Run with: pytest tests.py -v
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
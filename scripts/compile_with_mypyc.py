@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Compile the per-request query helpers to C extensions with mypyc.
+
+Usage:
+    python scripts/compile_with_mypyc.py            # Build the extensions in place
+    python scripts/compile_with_mypyc.py --clean    # Remove them again
+
+pytest collects app/queries.py as a test file and refuses to import it while the
+compiled extension shadows it, so run --clean before running the test suite.
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+project = Path(__file__).resolve().parent.parent
+
+# Modules compiled in place; Python imports the built extension instead of the .py file.
+# app/app.py and app/models.py stay interpreted because FastAPI and Pydantic introspect
+# their functions and classes at runtime.
+MYPYC_TARGETS = ["app/queries.py"]
+
+
+def compile_targets() -> None:
+    """Build the mypyc extensions next to their source files."""
+    from mypyc.build import mypycify
+    from setuptools import setup
+
+    setup(
+        name="credential-checks-mypyc",
+        packages=[],
+        ext_modules=mypycify(MYPYC_TARGETS),
+        script_args=["build_ext", "--inplace"],
+    )
+    print(f"\n✅ Compiled: {', '.join(MYPYC_TARGETS)}")
+
+
+def clean_targets() -> None:
+    """Remove the compiled extensions and the build directory."""
+    for target in MYPYC_TARGETS:
+        source = Path(target)
+        for ext in source.parent.glob(f"{source.stem}*.so"):
+            ext.unlink()
+            print(f"  ✓ Removed {ext}")
+    shutil.rmtree("build", ignore_errors=True)
+
+
+if __name__ == "__main__":
+    os.chdir(project)
+    if "--clean" in sys.argv[1:]:
+        clean_targets()
+    else:
+        compile_targets()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 """Convert txt data files to parquet format for efficient storage and loading."""
 
-import pandas as pd
 from pathlib import Path
 
+import duckdb
+
 # Setup paths
-project = Path.cwd()
+project = Path(__file__).resolve().parent.parent
 data_dir = project / "data"
 pw_dir = data_dir / "passwords"
 user_dir = data_dir / "usernames"
@@ -28,14 +29,19 @@ def convert_txt_to_parquet(input_dir: Path, column_name: str) -> None:
 
     for txt_file in txt_files:
         try:
-            # Read the txt file
-            df = pd.read_fwf(
-                txt_file, header=None, names=[column_name], dtype_backend="pyarrow"
-            ).drop_duplicates()
-
-            # Write to parquet with the same name but .parquet extension
+            # Stream the txt file into parquet with the same name but .parquet extension,
+            # one value per line: no delimiter or quote character splits a line
             parquet_file = txt_file.with_suffix(".parquet")
-            df.to_parquet(parquet_file, compression="snappy", index=False)
+            duckdb.sql(f"""
+            COPY (
+              SELECT DISTINCT trim(column0) AS {column_name}
+              FROM read_csv(
+                '{txt_file}', header = false, columns = {{'column0': 'VARCHAR'}},
+                delim = '\x1f', quote = '', escape = '', auto_detect = false
+              )
+              WHERE trim(column0) <> ''
+            ) TO '{parquet_file}' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """)
 
             # Get file sizes
             txt_size = txt_file.stat().st_size / (1024 * 1024)  # MB
@@ -1,55 +1,265 @@
 #!/usr/bin/env python3
-"""Test security fixes for SQL injection and XSS."""
-
-from app.queries import match_passwords, match_usernames
-
-# Test SQL injection attempts
-test_cases = [
-    "' OR '1'='1",
-    "admin'--",
-    "'; DROP TABLE--",
-    "1' UNION SELECT * FROM--",
-    "test' OR '1",
-]
-
-print("Testing SQL Injection Prevention:")
-print("=" * 60)
-for test_input in test_cases:
-    try:
-        result = match_passwords(test_input)
-        print(f"✓ Input: {test_input!r}")
-        print(f"  Result count: {len(result)}")
-        print(f"  Status: Input safely escaped\n")
-    except Exception as e:
-        print(f"✗ Input: {test_input!r}")
-        print(f"  Error: {e}\n")
-
-print("\n" + "=" * 60)
-print("Testing XSS prevention (input validation):")
-print("=" * 60)
+"""
+Test security fixes for SQL injection and XSS.
+
+Usage:
+    python test_security.py            # Report on the fixed SQL injection and XSS inputs
+    python test_security.py --n 10000  # Time lookups of a generated corpus of that size
+"""
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.paths import db as db_path
+from app.queries import (
+    match_passwords,
+    match_passwords_many,
+    read_only_connection,
+    validate_query,
+)
+
+# Test SQL injection attempts. The inputs are fixed, so they are kept as tuples of
+# interned strings; they key the result dicts below.
+test_cases: tuple[str, ...] = tuple(
+    sys.intern(s)
+    for s in (
+        "' OR '1'='1",
+        "admin'--",
+        "'; DROP TABLE--",
+        "1' UNION SELECT * FROM--",
+        "test' OR '1",
+    )
+)
 
 # Test XSS attempts
-xss_cases = [
-    "<img src=x onerror=\"alert('xss')\">",
-    "<script>alert('xss')</script>",
-    "javascript:alert('xss')",
-    "<svg onload=alert('xss')>",
-]
-
-for xss_input in xss_cases:
-    # This will be rejected by Pydantic if > 1000 chars, but let's check anyway
-    if len(xss_input) <= 1000:
+xss_cases: tuple[str, ...] = tuple(
+    sys.intern(s)
+    for s in (
+        "<img src=x onerror=\"alert('xss')\">",
+        "<script>alert('xss')</script>",
+        "javascript:alert('xss')",
+        "<svg onload=alert('xss')>",
+    )
+)
+# The XSS inputs are fixed and all within the API's length limits, so the report
+# loops over them without a rejection branch
+assert all(validate_query(x) is None for x in xss_cases)
+
+# Endings appended to the fixed inputs to generate the benchmark corpus
+_SQLI_SUFFIXES = ("", " --", " /*", ";", "#")
+_XSS_SUFFIXES = ("", "//", "<!--", " ", "\n")
+
+# Section separator
+BANNER = "=" * 60
+
+# One report block per input, formatted in a single call from the input's repr
+_SQL_TPL = (
+    "✓ Input: {rep}\n"
+    "  Result count: {n}\n"
+    "  Status: Input passed as bound parameter\n"
+)
+_ERR_TPL = "✗ Input: {rep}\n  Error: {err}\n"
+_XSS_TPL = (
+    "✓ Input: {rep}\n"
+    "  Result count: {n}\n"
+    "  Status: Input accepted (will be escaped on frontend)\n"
+)
+_REJECTED_TPL = "✓ Input: {rep}\n  Status: Rejected ({err})\n"
+
+
+def _generate(bases: tuple[str, ...], suffixes: tuple[str, ...], n: int) -> list[str]:
+    """Return n distinct inputs, each a base input plus a suffix and a counter"""
+    variants = (
+        f"{base}{suffix}{i}"
+        for i in itertools.count()
+        for base, suffix in itertools.product(bases, suffixes)
+    )
+    return list(itertools.islice(variants, n))
+
+
+def gen_sqli(n: int) -> list[str]:
+    """Generate n distinct SQL injection inputs from the fixed test cases"""
+    return _generate(test_cases, _SQLI_SUFFIXES, n)
+
+
+def gen_xss(n: int) -> list[str]:
+    """Generate n distinct XSS inputs from the fixed test cases"""
+    return _generate(xss_cases, _XSS_SUFFIXES, n)
+
+
+def flush(lines: list[str]) -> None:
+    """Write the collected lines to stdout in one call and reset the buffer."""
+    sys.stdout.write("\n".join(lines) + "\n")
+    lines.clear()
+
+
+class SecurityResult(NamedTuple):
+    """Outcome of running one input through validation and the password lookups"""
+
+    rejected: str | None
+    exact_count: int
+    error: Exception | None
+
+
+def run_security_tests(
+    conn: duckdb.DuckDBPyConnection, inputs: Sequence[str]
+) -> dict[str, SecurityResult]:
+    """
+    Run inputs through validation and the exact-match password lookups.
+
+    Every input is looked up once in a single batched query and once on its own, and
+    both must bind it as a parameter and find the same rows. Does no I/O besides the
+    queries, so it can be timed or reused on its own; inputs the API would reject are
+    not looked up. Raises if the batched lookup fails.
+    """
+    errors = {x: validate_query(x) for x in inputs}
+    valid = [x for x in inputs if errors[x] is None]
+    sql, params = match_passwords_many(valid)
+
+    # One cursor per worker thread, created on its first query and reused for the rest
+    local = threading.local()
+    cursors: list[duckdb.DuckDBPyConnection] = []
+
+    def safe_match(test_input: str) -> tuple[str, int | Exception]:
+        """Look up one input on its worker's cursor of the shared connection."""
+        single_sql, single_params = match_passwords(test_input)
         try:
-            result = match_passwords(xss_input)
-            print(f"✓ Input: {xss_input!r}")
-            print(f"  Result count: {len(result)}")
-            print(f"  Status: Input accepted (will be escaped on frontend)\n")
+            if test_input not in params or test_input not in single_params:
+                raise ValueError("input was not passed as a bound parameter")
+            if not hasattr(local, "cur"):
+                local.cur = conn.cursor()
+                cursors.append(local.cur)
+            return test_input, len(local.cur.execute(single_sql, single_params).fetchall())
         except Exception as e:
-            print(f"✗ Input: {xss_input!r}")
-            print(f"  Error: {e}\n")
-    else:
-        print(f"✓ Input: {xss_input!r}")
-        print(f"  Status: Rejected (exceeds max_length=1000)\n")
-
-print("=" * 60)
-print("All security tests completed!")
+            return test_input, e
+
+    # Look up every input with one batched query
+    rows = conn.execute(sql, params).fetchall() if valid else []
+
+    # The per-input lookups wait on DuckDB, so they run concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(valid)))) as ex:
+        single_results = dict(ex.map(safe_match, valid))
+    for cur in cursors:
+        cur.close()
+
+    # Count the matched rows per input; each row carries the input it matched
+    counts = Counter(needle for needle, _, _ in rows)
+
+    results = {}
+    for x in inputs:
+        single = single_results.get(x, 0)
+        if errors[x] is not None:
+            results[x] = SecurityResult(errors[x], 0, None)
+        elif isinstance(single, Exception):
+            results[x] = SecurityResult(None, 0, single)
+        elif single != counts[x]:
+            mismatch = ValueError(f"batched lookup found {counts[x]} rows, single {single}")
+            results[x] = SecurityResult(None, counts[x], mismatch)
+        else:
+            results[x] = SecurityResult(None, counts[x], None)
+    return results
+
+
+def report(results: dict[str, SecurityResult]) -> None:
+    """Print the results for the fixed SQL injection and XSS inputs"""
+    # Output is collected per section and written at once instead of line by line
+    out: list[str] = []
+
+    out.append("Testing SQL Injection Prevention:")
+    out.append(BANNER)
+    for test_input in test_cases:
+        rep = repr(test_input)
+        result = results[test_input]
+        if result.rejected is not None:
+            out.append(_REJECTED_TPL.format(rep=rep, err=result.rejected))
+        elif result.error is not None:
+            out.append(_ERR_TPL.format(rep=rep, err=result.error))
+        else:
+            out.append(_SQL_TPL.format(rep=rep, n=result.exact_count))
+
+    flush(out)
+
+    out.append("\n" + BANNER)
+    out.append("Testing XSS prevention (input validation):")
+    out.append(BANNER)
+
+    for xss_input in xss_cases:
+        rep = repr(xss_input)
+        result = results[xss_input]
+        if result.error is not None:
+            out.append(_ERR_TPL.format(rep=rep, err=result.error))
+        else:
+            out.append(_XSS_TPL.format(rep=rep, n=result.exact_count))
+
+    out.append(BANNER)
+    out.append("All security tests completed!")
+    flush(out)
+
+
+def benchmark(conn: duckdb.DuckDBPyConnection, n: int) -> None:
+    """Time exact lookups of n generated inputs, one by one and batched, and print a summary"""
+    inputs = gen_sqli(n - n // 2) + gen_xss(n // 2)
+
+    # Substring queries scan the whole table and take far longer than exact lookups,
+    # so only the exact-match path is timed. Timings go into one preallocated int64
+    # array rather than per-input objects.
+    timings = array("q", bytes(8 * len(inputs)))
+    for i, test_input in enumerate(inputs):
+        sql, params = match_passwords(test_input)
+        start = time.perf_counter_ns()
+        conn.execute(sql, params).fetchall()
+        timings[i] = time.perf_counter_ns() - start
+
+    sql, params = match_passwords_many(inputs)
+    start = time.perf_counter_ns()
+    conn.execute(sql, params).fetchall()
+    batched = time.perf_counter_ns() - start
+
+    # View the array as an Arrow column without copying and compute the stats on it
+    column = pa.Array.from_buffers(pa.int64(), len(timings), [None, pa.py_buffer(timings)])
+    p50, p95 = pc.quantile(column, q=[0.5, 0.95]).to_pylist()
+    flush(
+        [
+            f"Inputs: {len(inputs)}",
+            f"Per-input lookup p50: {p50 / 1e6:.3f} ms",
+            f"Per-input lookup p95: {p95 / 1e6:.3f} ms",
+            f"Per-input lookups total: {pc.sum(column).as_py() / 1e6:.1f} ms",
+            f"Batched lookup total: {batched / 1e6:.1f} ms",
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--n", type=int, help="time lookups of this many generated inputs instead"
+    )
+    args = parser.parse_args()
+    if args.n is not None and args.n < 1:
+        parser.error("--n must be at least 1")
+
+    if not db_path.exists():
+        sys.exit(f"Database not found at {db_path}; create it with: python -m app.database")
+
+    # All queries share one connection, opened once for the whole run
+    with read_only_connection(db_path) as conn:
+        if args.n is None:
+            try:
+                results = run_security_tests(conn, test_cases + xss_cases)
+            except duckdb.Error as e:
+                sys.exit(f"✗ Batched lookup failed: {e}")
+            report(results)
+        else:
+            benchmark(conn, args.n)